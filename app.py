@@ -1,8 +1,8 @@
 # app.py - Minimal & Branded OutlineIQ
 import streamlit as st
 from pathlib import Path
-import json
-from utils import extract_outline
+import orjson
+from utils import extract_outline, json_default
 
 st.set_page_config(page_title="OutlineIQ", page_icon="📑", layout="centered")
 
@@ -50,6 +50,12 @@ with cols[0]:
 with cols[1]:
     st.markdown('<div class="hero"><div><h1 class="title">OutlineIQ</h1><p class="tag">Extract structured outlines, links, and images from PDFs.</p></div></div>', unsafe_allow_html=True)
 
+# ------------------ Extraction (cached) ------------------
+@st.cache_data(show_spinner=False, max_entries=8, ttl=3600)
+def _cached_extract(pdf_bytes: bytes):
+    # Keyed on a hash of the bytes, so reruns on the same upload skip extraction
+    return extract_outline(pdf_bytes)
+
 # ------------------ Upload ------------------
 st.markdown('<div class="upload-box">', unsafe_allow_html=True)
 uploaded_file = st.file_uploader("Upload a PDF", type=["pdf"], label_visibility="collapsed")
@@ -59,7 +65,7 @@ st.markdown('</div>', unsafe_allow_html=True)
 if uploaded_file:
     with st.spinner("🔎 Extracting..."):
         try:
-            title, headings, metadata = extract_outline(uploaded_file.read())
+            title, headings, metadata = _cached_extract(uploaded_file.getvalue())
             result = {"title": title, "headings": headings, "metadata": metadata}
         except Exception as e:
             st.error(f"❌ Extraction failed: {e}")
@@ -78,13 +84,17 @@ if uploaded_file:
         st.markdown('<div class="card">', unsafe_allow_html=True)
         st.subheader("📘 Outline")
         if result["headings"]:
-            table_html = "<table style='width:100%;border-collapse:collapse'>"
-            table_html += "<tr><th align='left'>Level</th><th align='left'>Text</th><th>Page</th></tr>"
+            level_colors = {"H1": "#1fb6ff", "H2": "#ffb547", "H3": "#ffd166"}
+            parts = [
+                "<table style='width:100%;border-collapse:collapse'>",
+                "<tr><th align='left'>Level</th><th align='left'>Text</th><th>Page</th></tr>",
+            ]
             for h in result["headings"]:
                 lvl = h.get("level", "")
-                color = "#1fb6ff" if lvl == "H1" else ("#ffb547" if lvl == "H2" else "#ffd166")
-                table_html += f"<tr><td><span style='background:{color};padding:4px 8px;border-radius:6px;color:#0a0a0a;font-weight:700'>{lvl}</span></td><td>{h.get('text')}</td><td align='center'>{h.get('page')}</td></tr>"
-            table_html += "</table>"
+                color = level_colors.get(lvl, "#ffd166")
+                parts.append(f"<tr><td><span style='background:{color};padding:4px 8px;border-radius:6px;color:#0a0a0a;font-weight:700'>{lvl}</span></td><td>{h.get('text')}</td><td align='center'>{h.get('page')}</td></tr>")
+            parts.append("</table>")
+            table_html = "".join(parts)
             st.markdown(table_html, unsafe_allow_html=True)
         else:
             st.write("No headings detected.")
@@ -114,7 +124,7 @@ if uploaded_file:
             st.write("No images detected.")
 
         # Download JSON
-        json_blob = json.dumps(result, indent=2, ensure_ascii=False)
+        json_blob = orjson.dumps(result, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=json_default)
         st.download_button("⬇️ Download JSON", data=json_blob, file_name=f"{Path(uploaded_file.name).stem}_outline.json", mime="application/json", use_container_width=True)
 else:
     st.markdown("<div class='hint'>📂 Upload a PDF to get started</div>", unsafe_allow_html=True)
@@ -6,11 +6,19 @@ Scans PDFs from `input/` and writes JSON results to `output/`.
 """
 
 import os
-import json
 import time
 import logging
+import argparse
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import chain
+from operator import itemgetter
 from pathlib import Path
-from utils import extract_outline
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+from utils import extract_outline, has_bookmarks, json_default, page_count
 
 # --- Config ---
 INPUT_DIR = Path("input")
@@ -20,8 +28,40 @@ LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(message)s"
 logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
 logger = logging.getLogger("outlineiq-batch")
 
+DEFAULT_WORKERS = min(os.cpu_count() or 1, 4)
+DEFAULT_PAGE_BATCH_SIZE = 32
+
+
+def _to_json(title: str, headings: list, metadata: dict) -> bytes:
+    output_data = {
+        "title": title,
+        "headings": headings,
+        "metadata": metadata,
+    }
+    return orjson.dumps(output_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS, default=json_default)
+
+
+def save_output(filepath: Path, title: str, headings: list, metadata: dict, *, overwrite: bool = True) -> None:
+    """
+    Write the JSON result for ``filepath`` to OUTPUT_DIR (shared by all processing paths).
+    """
+    out_file = OUTPUT_DIR / f"{filepath.stem}.json"
+    if out_file.exists() and not overwrite:
+        logger.warning("Skipping %s (output already exists)", out_file.name)
+        return
+
+    out_file.write_bytes(_to_json(title, headings, metadata))
+
+    logger.info("✅ Saved: %s", out_file)
+
 
-def process_pdf(filepath: Path, *, overwrite: bool = True) -> None:
+def process_pdf(
+    filepath: Path,
+    *,
+    overwrite: bool = True,
+    mode: str = "full",
+    heading_detection: str = "font",
+) -> None:
     """
     Process a single PDF and save output JSON.
     """
@@ -29,29 +69,188 @@ def process_pdf(filepath: Path, *, overwrite: bool = True) -> None:
         logger.info("Processing: %s", filepath.name)
 
         # Run extraction
-        title, headings, metadata = extract_outline(filepath)
+        title, headings, metadata = extract_outline(filepath, mode=mode, heading_detection=heading_detection)
 
-        output_data = {
-            "title": title,
-            "headings": headings,
-            "metadata": metadata,
-        }
+        save_output(filepath, title, headings, metadata, overwrite=overwrite)
 
-        out_file = OUTPUT_DIR / f"{filepath.stem}.json"
-        if out_file.exists() and not overwrite:
-            logger.warning("Skipping %s (output already exists)", out_file.name)
+    except Exception as e:
+        logger.exception("❌ Failed to process %s: %s", filepath.name, e)
+
+
+def process_pipelined(
+    pdf_files: List[Path],
+    *,
+    mode: str = "full",
+    heading_detection: str = "font",
+) -> None:
+    """
+    Process PDFs one after another in this process, overlapping disk I/O with
+    extraction: while a file is parsed, the next one is read and the previous
+    result is written by a small I/O thread pool (double buffering).
+
+    In "metadata" mode nothing is prefetched: extract_outline maps the file and
+    only reads the trailer, which is far cheaper than loading the whole PDF.
+    """
+    if not pdf_files:
+        return
+
+    def _wait_for_write(write: Optional[Future], filepath: Optional[Path]) -> None:
+        if write is None:
             return
+        try:
+            write.result()
+        except Exception as e:
+            logger.exception("❌ Failed to save %s: %s", filepath.name, e)
 
-        with out_file.open("w", encoding="utf-8") as f:
-            json.dump(output_data, f, indent=2, ensure_ascii=False)
+    prefetch = mode != "metadata"
 
-        logger.info("✅ Saved: %s", out_file)
+    with ThreadPoolExecutor(max_workers=2) as io_pool:
+        next_read = io_pool.submit(pdf_files[0].read_bytes) if prefetch else None
+        prev_write: Optional[Future] = None
+        prev_file: Optional[Path] = None
 
-    except Exception as e:
-        logger.exception("❌ Failed to process %s: %s", filepath.name, e)
+        for index, filepath in enumerate(pdf_files):
+            read = next_read
+            if prefetch and index + 1 < len(pdf_files):
+                next_read = io_pool.submit(pdf_files[index + 1].read_bytes)
+
+            try:
+                logger.info("Processing: %s", filepath.name)
+                source = read.result() if read is not None else filepath
+                title, headings, metadata = extract_outline(source, mode=mode, heading_detection=heading_detection)
+            except Exception as e:
+                logger.exception("❌ Failed to process %s: %s", filepath.name, e)
+                continue
+
+            _wait_for_write(prev_write, prev_file)
+            prev_file = filepath
+            prev_write = io_pool.submit(save_output, filepath, title, headings, metadata)
+
+        _wait_for_write(prev_write, prev_file)
+
+
+def extract_pages(
+    filepath: Path,
+    page_range: Tuple[int, int],
+    *,
+    mode: str = "full",
+    heading_detection: str = "font",
+) -> Tuple[str, List[Dict], Dict]:
+    """
+    Extract one page range of a large PDF (runs in a worker process).
+    """
+    return extract_outline(filepath, mode=mode, heading_detection=heading_detection, page_range=page_range)
+
+
+def merge_page_results(results: List[Tuple[str, List[Dict], Dict]]) -> Tuple[str, List[Dict], Dict]:
+    """
+    Combine per-range results of one PDF into a single (title, headings, metadata).
+
+    ``results`` must be in page-range order. Headings are concatenated, not
+    sorted: font-heuristic headings are then already in page order, and
+    bookmark headings (all in the first range) keep their TOC order.
+    """
+    by_page = itemgetter("page")
+    title = results[0][0]
+    headings = list(chain.from_iterable(r[1] for r in results))
+    metadata = {
+        "pages_with_images": sorted(set(chain.from_iterable(r[2]["pages_with_images"] for r in results))),
+        "links": sorted(chain.from_iterable(r[2]["links"] for r in results), key=by_page),
+        "image_previews": sorted(chain.from_iterable(r[2]["image_previews"] for r in results), key=by_page),
+    }
+    return title, headings, metadata
+
+
+def process_batched(
+    pdf_files: List[Path],
+    *,
+    workers: int,
+    page_batch_size: int = DEFAULT_PAGE_BATCH_SIZE,
+    mode: str = "full",
+    heading_detection: str = "font",
+) -> None:
+    """
+    Process PDFs on a process pool. PDFs longer than 2 * page_batch_size pages
+    are split into page ranges so a single large document doesn't pin one
+    worker while the others sit idle; their partial results are merged here.
+    """
+    task = partial(process_pdf, mode=mode, heading_detection=heading_detection)
+    range_task = partial(extract_pages, mode=mode)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        whole_files: List[Future] = []
+        split_files: Dict[Path, List[Future]] = {}
+
+        for filepath in pdf_files:
+            pages = 0
+            if page_batch_size > 0 and mode != "metadata":
+                try:
+                    pages = page_count(filepath)
+                except Exception:
+                    pass  # process_pdf reports unreadable files
+            if pages > 2 * page_batch_size:
+                logger.info("Splitting %s (%d pages) into batches of %d", filepath.name, pages, page_batch_size)
+                # Resolve "auto" once here so range workers don't each re-read the TOC
+                source = heading_detection
+                if source == "auto":
+                    source = "bookmarks" if has_bookmarks(filepath) else "font"
+                split_files[filepath] = [
+                    executor.submit(
+                        range_task,
+                        filepath,
+                        (start, min(start + page_batch_size, pages)),
+                        heading_detection=source,
+                    )
+                    for start in range(0, pages, page_batch_size)
+                ]
+            else:
+                # process_pdf writes its own JSON and returns None, so only the Path is pickled
+                whole_files.append(executor.submit(task, filepath))
+
+        for filepath, futures in split_files.items():
+            try:
+                title, headings, metadata = merge_page_results([f.result() for f in futures])
+                save_output(filepath, title, headings, metadata)
+            except Exception as e:
+                logger.exception("❌ Failed to process %s: %s", filepath.name, e)
+
+        for future in whole_files:
+            future.result()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Batch-extract PDF outlines from input/ to output/.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=DEFAULT_WORKERS,
+        help="number of worker processes; 1 runs a single-process pipeline that reads the next "
+        f"PDF and writes the previous JSON while extracting (default: {DEFAULT_WORKERS})",
+    )
+    parser.add_argument(
+        "--mode",
+        choices=["full", "headings", "metadata"],
+        default="full",
+        help="what to extract: everything, headings only, or just the title (default: full)",
+    )
+    parser.add_argument(
+        "--headings",
+        choices=["font", "bookmarks", "auto"],
+        default="font",
+        help="heading source: font-size heuristic, PDF bookmarks, or bookmarks with font fallback (default: font)",
+    )
+    parser.add_argument(
+        "--page-batch-size",
+        type=int,
+        default=DEFAULT_PAGE_BATCH_SIZE,
+        help="split PDFs longer than twice this many pages across workers; 0 disables "
+        f"(default: {DEFAULT_PAGE_BATCH_SIZE})",
+    )
+    return parser.parse_args()
 
 
 def main():
+    args = parse_args()
     start_time = time.time()
     OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -64,10 +263,21 @@ def main():
         logger.warning("No PDFs found in %s", INPUT_DIR)
         return
 
-    logger.info("Found %d PDF(s) in %s", len(pdf_files), INPUT_DIR)
+    workers = max(1, args.workers)
+    logger.info("Found %d PDF(s) in %s, using %d worker(s)", len(pdf_files), INPUT_DIR, workers)
 
-    for pdf_file in pdf_files:
-        process_pdf(pdf_file)
+    if workers == 1:
+        # A single worker gains nothing from a process pool; overlap I/O with parsing instead
+        process_pipelined(pdf_files, mode=args.mode, heading_detection=args.headings)
+    else:
+        # With several processes the OS already overlaps one worker's I/O with another's CPU
+        process_batched(
+            pdf_files,
+            workers=workers,
+            page_batch_size=args.page_batch_size,
+            mode=args.mode,
+            heading_detection=args.headings,
+        )
 
     elapsed = time.time() - start_time
     logger.info("✅ All done in %.2f seconds", elapsed)
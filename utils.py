@@ -4,43 +4,76 @@ utils.py
 PDF outline / metadata extractor for OutlineIQ.
 
 - Uses PyMuPDF (fitz) to read PDFs.
-- Detects headings using font-size heuristics (configurable).
-- Extracts first image preview per page (thumbnail, returned as data URI base64).
+- Detects headings using font-size heuristics (configurable) or the PDF's bookmarks.
+- Extracts first image preview per page (MuPDF-rendered PNG thumbnail bytes;
+  `json_default` turns them into base64 data URIs when writing JSON).
 - Collects hyperlinks.
 - Accepts either a file path (str / Path) or raw PDF bytes.
 
 Return:
     title: str
-    headings: list[dict]  # {"level": "H1"|"H2"|"H3", "text": str, "page": int, "font_size": float}
+    headings: list[dict]  # {"level": "H1"|"H2"|"H3", "text": str, "page": int, "font_size": float|None}
     metadata: dict  # {"pages_with_images": [...], "links": [...], "image_previews": [...]}
 """
 
 from __future__ import annotations
-import io
+import mmap
 import base64
 import logging
-from typing import Tuple, List, Dict, Union, Optional
+from typing import Tuple, List, Dict, Union, Optional, Literal
 from pathlib import Path
 
 import fitz  # PyMuPDF
-from PIL import Image
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
+# "full": headings + links + images; "headings": skip links/images;
+# "metadata": title only, pages are never touched.
+ExtractMode = Literal["full", "metadata", "headings"]
 
-def _make_image_preview(img_bytes: bytes, max_size: int = 160) -> str:
+# "font": font-size heuristic; "bookmarks": the PDF's own outline (TOC) only;
+# "auto": bookmarks when the PDF has any, font heuristic otherwise.
+HeadingDetection = Literal["font", "bookmarks", "auto"]
+
+
+def _make_image_preview(doc: fitz.Document, xref: int, max_size: int = 160) -> bytes:
     """
-    Create a PNG thumbnail from image bytes and return a data URI (base64).
+    Render a PNG thumbnail of an embedded image and return the PNG bytes.
+
+    The image is decoded and scaled by MuPDF directly, so no full-size copy is
+    handed over to Python.
     """
-    with Image.open(io.BytesIO(img_bytes)) as img:
-        img = img.convert("RGB")
-        img.thumbnail((max_size, max_size), Image.LANCZOS)
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)  # drop alpha, previews are opaque RGB
+    if pix.colorspace is None or pix.colorspace.n != 3:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+
+    scale = max_size / max(pix.width, pix.height)
+    if scale < 1:
+        # Cheap integer box filter first, then an exact resample to the target size
+        shrink = 0
+        while scale * (1 << (shrink + 1)) <= 0.5:
+            shrink += 1
+        if shrink:
+            pix.shrink(shrink)
+        width = max(1, round(pix.width * scale * (1 << shrink)))
+        height = max(1, round(pix.height * scale * (1 << shrink)))
+        pix = fitz.Pixmap(pix, width, height, None)
+
+    return pix.tobytes("png")
+
 
-        buf = io.BytesIO()
-        img.save(buf, format="PNG")
-        b64 = base64.b64encode(buf.getvalue()).decode("ascii")
+def json_default(obj):
+    """
+    ``default`` hook for JSON serializers: encodes PNG preview bytes as a
+    base64 data URI, so the encoding only happens when JSON is written.
+    """
+    if isinstance(obj, (bytes, bytearray)):
+        b64 = base64.b64encode(obj).decode("ascii")
         return f"data:image/png;base64,{b64}"
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 
 def _normalize_text(s: str) -> str:
@@ -48,6 +81,151 @@ def _normalize_text(s: str) -> str:
     return " ".join(s.split()).strip()
 
 
+def _process_page(
+    doc: fitz.Document,
+    page_number: int,
+    *,
+    thresholds: List[Tuple[float, str]],
+    image_preview_max_size: int,
+    detect_first_image_only: bool,
+    preview_cache: Dict[int, bytes],
+    mode: ExtractMode = "full",
+) -> Tuple[List[Dict], List[Dict], List[Dict], bool]:
+    """
+    Extract headings, links and image previews from a single (1-based) page.
+
+    ``thresholds`` is a list of ``(min_font_size, level)`` pairs checked in
+    order; a line gets the first level whose minimum it meets.
+    An empty list skips heading detection.
+    ``preview_cache`` maps image xrefs to previews already rendered for this
+    document, so images repeated across pages (logos, headers) render once.
+    Links and images are only collected in ``"full"`` mode.
+
+    Returns:
+        headings_chunk, links_chunk, images_chunk, has_image
+    """
+    page = doc[page_number - 1]
+    headings: List[Dict] = []
+    links: List[Dict] = []
+    image_previews: List[Dict] = []
+    has_image = False
+
+    if mode == "full":
+        # --- Images ---
+        try:
+            images = page.get_images(full=True)
+            if images:
+                has_image = True
+                # Optionally extract only the first image to keep memory low
+                imgs_to_process = images[:1] if detect_first_image_only else images
+                for img_meta in imgs_to_process:
+                    xref = img_meta[0]
+                    try:
+                        preview = preview_cache.get(xref)
+                        if preview is None:
+                            preview = _make_image_preview(doc, xref, max_size=image_preview_max_size)
+                            preview_cache[xref] = preview
+                        image_previews.append({"page": page_number, "preview": preview})
+                    except Exception as e_img:
+                        logger.debug("Failed to extract/preview image on page %s: %s", page_number, e_img)
+        except Exception as e_images:
+            logger.debug("Image extraction error on page %s: %s", page_number, e_images)
+
+        # --- Links ---
+        try:
+            # Walk the page's link chain directly instead of get_links(), which
+            # resolves a full destination dict for every link. Internal links
+            # have no URI scheme; "file:" ones are launch/remote-PDF targets.
+            link = page.first_link
+            while link:
+                uri = link.uri
+                if uri and link.is_external and not uri.startswith("file:"):
+                    links.append({"page": page_number, "uri": uri})
+                link = link.next
+        except Exception as e_links:
+            logger.debug("Link extraction error on page %s: %s", page_number, e_links)
+
+    # --- Headings (heuristic by font size) ---
+    if not thresholds:
+        return headings, links, image_previews, has_image
+
+    seen = set()
+    try:
+        # Block bbox height is no bound on span size (unevenly scaled text), so
+        # every block is scanned.
+        blocks = page.get_text("dict").get("blocks", [])
+        for block in blocks:
+            if "lines" not in block:
+                continue
+            for line in block["lines"]:
+                spans = line.get("spans", [])
+                if not spans:
+                    continue
+                # Single pass over spans: collect text and the largest font size
+                parts: List[str] = []
+                mx = 0.0
+                for span in spans:
+                    parts.append(span.get("text", ""))
+                    size = span.get("size", 0.0)
+                    if size > mx:
+                        mx = size
+                text = " ".join(parts).strip()
+                if not text:
+                    continue
+                max_font = float(mx)
+
+                level = next((lvl for min_size, lvl in thresholds if max_font >= min_size), None)
+
+                if level:
+                    normalized = _normalize_text(text)
+                    # Drop duplicates (same level and text) on this page as we go
+                    key = (level, normalized.lower())
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    headings.append({
+                        "level": level,
+                        "text": normalized,
+                        "page": page_number,
+                        "font_size": round(max_font, 2)
+                    })
+    except Exception as e_text:
+        logger.debug("Text extraction error on page %s: %s", page_number, e_text)
+
+    return headings, links, image_previews, has_image
+
+
+def page_count(source: Union[str, Path]) -> int:
+    """Return the number of pages of the PDF at ``source``."""
+    with fitz.open(str(source)) as doc:
+        return len(doc)
+
+
+def has_bookmarks(source: Union[str, Path]) -> bool:
+    """Return True if the PDF at ``source`` has a usable outline (bookmarks)."""
+    with fitz.open(str(source)) as doc:
+        return bool(_headings_from_toc(doc))
+
+
+def _headings_from_toc(doc: fitz.Document) -> List[Dict]:
+    """
+    Convert the PDF outline (bookmarks) into heading dicts. Levels deeper than
+    3 are reported as H3; bookmarks carry no font size, so it is None.
+    """
+    headings: List[Dict] = []
+    for level, text, page_number in doc.get_toc(simple=True):
+        normalized = _normalize_text(text)
+        if not normalized or page_number < 1:
+            continue
+        headings.append({
+            "level": f"H{min(level, 3)}",
+            "text": normalized,
+            "page": page_number,
+            "font_size": None,
+        })
+    return headings
+
+
 def extract_outline(
     source: Union[str, Path, bytes],
     *,
@@ -56,6 +234,9 @@ def extract_outline(
     min_h3: float = 10.0,
     image_preview_max_size: int = 160,
     detect_first_image_only: bool = True,
+    mode: ExtractMode = "full",
+    heading_detection: HeadingDetection = "font",
+    page_range: Optional[Tuple[int, int]] = None,
 ) -> Tuple[str, List[Dict], Dict]:
     """
     Extract title, headings and metadata from a PDF.
@@ -65,103 +246,86 @@ def extract_outline(
         min_h1, min_h2, min_h3: font-size thresholds (points) to classify headings.
         image_preview_max_size: max dimension of thumbnail in pixels.
         detect_first_image_only: if True, capture only first image per page.
+        mode: "full" (default) extracts everything; "headings" skips links and
+            image previews; "metadata" returns only the title with empty
+            headings/metadata. MuPDF reads the info dictionary via the xref
+            trailer without scanning the file, so "metadata" costs next to
+            nothing even on very large PDFs.
+        heading_detection: "font" (default) classifies lines by font size;
+            "bookmarks" uses the PDF outline and skips the span scan entirely;
+            "auto" uses bookmarks when present and falls back to "font".
+        page_range: optional 0-based, end-exclusive ``(start, end)``; pages
+            outside it are skipped, so large PDFs can be split across workers.
+            Bookmark headings are not split: the range starting at 0 returns
+            the whole TOC in TOC order and the other ranges return none.
 
     Returns:
         title, headings_list, metadata_dict
     """
     doc: Optional[fitz.Document] = None
+    mapped: Optional[mmap.mmap] = None
+    view: Optional[memoryview] = None
     try:
         if isinstance(source, (bytes, bytearray)):
-            doc = fitz.open(stream=source, filetype="pdf")
+            pdf_stream: Union[bytes, memoryview] = bytes(source)
         else:
-            doc = fitz.open(str(source))
+            # Map the file instead of reading it: MuPDF works on the buffer in
+            # place, so only the parts it actually parses are paged in.
+            with open(source, "rb") as fh:
+                mapped = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+            pdf_stream = view = memoryview(mapped)
+        doc = fitz.open(stream=pdf_stream, filetype="pdf")
 
         # Title fallback
         title = doc.metadata.get("title") or ""
         title = title.strip() or "Untitled"
 
+        if mode == "metadata":
+            return title, [], {"pages_with_images": [], "links": [], "image_previews": []}
+
+        toc_headings: Optional[List[Dict]] = None
+        if heading_detection == "bookmarks" and page_range is not None and page_range[0] > 0:
+            # The range starting at page 0 reports the whole TOC
+            toc_headings = []
+        elif heading_detection in ("bookmarks", "auto"):
+            toc_headings = _headings_from_toc(doc)
+            # Decide the "auto" fallback on the whole TOC, so every page range
+            # of a split document uses the same heading source
+            if heading_detection == "auto" and not toc_headings:
+                toc_headings = None
+            elif page_range is not None and page_range[0] > 0:
+                toc_headings = []
+        if toc_headings is not None and mode == "headings":
+            # Nothing left to collect from the pages
+            return title, toc_headings, {"pages_with_images": [], "links": [], "image_previews": []}
+
+        page_options = dict(
+            # Declared H1 -> H2 -> H3 order, matching the original if/elif chain
+            # even when the thresholds are not monotone
+            thresholds=[(min_h1, "H1"), (min_h2, "H2"), (min_h3, "H3")] if toc_headings is None else [],
+            image_preview_max_size=image_preview_max_size,
+            detect_first_image_only=detect_first_image_only,
+            preview_cache={},
+            mode=mode,
+        )
+        start, end = page_range if page_range is not None else (0, len(doc))
+        page_indices = list(range(max(start, 0) + 1, min(end, len(doc)) + 1))
+        page_results = [_process_page(doc, n, **page_options) for n in page_indices]
+
         headings: List[Dict] = []
         pages_with_images = set()
         links: List[Dict] = []
         image_previews: List[Dict] = []
 
-        for page_number, page in enumerate(doc, start=1):
-            # --- Images ---
-            try:
-                images = page.get_images(full=True)
-                if images:
-                    pages_with_images.add(page_number)
-                    # Optionally extract only the first image to keep memory low
-                    imgs_to_process = images[:1] if detect_first_image_only else images
-                    for img_meta in imgs_to_process:
-                        xref = img_meta[0]
-                        try:
-                            base_image = doc.extract_image(xref)
-                            img_bytes = base_image.get("image")
-                            if img_bytes:
-                                preview = _make_image_preview(img_bytes, max_size=image_preview_max_size)
-                                image_previews.append({"page": page_number, "preview": preview})
-                        except Exception as e_img:
-                            logger.debug("Failed to extract/preview image on page %s: %s", page_number, e_img)
-            except Exception as e_images:
-                logger.debug("Image extraction error on page %s: %s", page_number, e_images)
-
-            # --- Links ---
-            try:
-                for link in page.get_links():
-                    uri = link.get("uri")
-                    if uri:
-                        links.append({"page": page_number, "uri": uri})
-            except Exception as e_links:
-                logger.debug("Link extraction error on page %s: %s", page_number, e_links)
-
-            # --- Headings (heuristic by font size) ---
-            try:
-                page_dict = page.get_text("dict")
-                blocks = page_dict.get("blocks", [])
-                for block in blocks:
-                    if "lines" not in block:
-                        continue
-                    for line in block["lines"]:
-                        spans = line.get("spans", [])
-                        if not spans:
-                            continue
-                        text = " ".join(span.get("text", "") for span in spans).strip()
-                        if not text:
-                            continue
-                        # Determine the largest font size in the line
-                        try:
-                            max_font = max(float(span.get("size", 0)) for span in spans)
-                        except Exception:
-                            max_font = 0.0
-
-                        level: Optional[str] = None
-                        if max_font >= min_h1:
-                            level = "H1"
-                        elif max_font >= min_h2:
-                            level = "H2"
-                        elif max_font >= min_h3:
-                            level = "H3"
-
-                        if level:
-                            normalized = _normalize_text(text)
-                            headings.append({
-                                "level": level,
-                                "text": normalized,
-                                "page": page_number,
-                                "font_size": round(max_font, 2)
-                            })
-            except Exception as e_text:
-                logger.debug("Text extraction error on page %s: %s", page_number, e_text)
-
-        # Deduplicate nearby duplicates while preserving order
-        seen = set()
-        deduped_headings = []
-        for h in headings:
-            key = (h["level"], h["text"].lower(), h["page"])
-            if key not in seen:
-                deduped_headings.append(h)
-                seen.add(key)
+        for page_number, (headings_chunk, links_chunk, images_chunk, has_image) in zip(page_indices, page_results):
+            headings.extend(headings_chunk)
+            links.extend(links_chunk)
+            image_previews.extend(images_chunk)
+            if has_image:
+                pages_with_images.add(page_number)
+
+        if toc_headings is not None:
+            headings = toc_headings
 
         metadata = {
             "pages_with_images": sorted(pages_with_images),
@@ -169,7 +333,7 @@ def extract_outline(
             "image_previews": image_previews,
         }
 
-        return title, deduped_headings, metadata
+        return title, headings, metadata
 
     finally:
         if doc is not None:
@@ -177,3 +341,11 @@ def extract_outline(
                 doc.close()
             except Exception:
                 pass
+        # The mapping can only be closed once the document no longer uses the view
+        if view is not None:
+            view.release()
+        if mapped is not None:
+            mapped.close()
+        # MuPDF's global store (cached fonts, images, ...) is unbounded by
+        # default; empty it so long batch runs don't accumulate across files.
+        fitz.TOOLS.store_shrink(100)